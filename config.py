@@ -1,21 +1,57 @@
 
 #!/usr/bin/env python3
-import argparse, csv, os, re
+import argparse, bisect, csv, hashlib, json, os, re, threading
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as _json_loads  # optional, much faster on large timelines
+except ImportError:
+    _json_loads = json.loads
 
 API_VERSION = "7.1"
+GH_GRAPHQL_URL = "https://api.github.com/graphql"
+GH_GRAPHQL_BATCH = 75  # commits aliased per GraphQL query
+CSV_BUFFER = 1 << 20    # bytes; fewer write() syscalls for the larger CSVs
+HTTP_TIMEOUT = (5, 20)  # (connect, read) seconds per attempt
+
+# Transient 429/5xx on GETs are retried with exponential backoff, honouring Retry-After.
+# raise_on_status=False hands the final response back so callers see the real status.
+_RETRY_KW = dict(total=4, backoff_factor=0.4, status_forcelist=[429, 500, 502, 503, 504],
+                 allowed_methods=["GET"], respect_retry_after_header=True, raise_on_status=False)
+try:
+    HTTP_RETRY = Retry(backoff_jitter=0.3, **_RETRY_KW)
+except TypeError:  # urllib3 < 2 has no jitter
+    HTTP_RETRY = Retry(**_RETRY_KW)
+
+_API_REPOS_RE = re.compile(r"/repos/([^/]+/[^/]+)")
+_API_REPOS_TAIL_RE = re.compile(r"/repos/[^/]+/[^/]+$")
+_API_HOST_REPOS_RE = re.compile(r"^(https?://[^/]+)/repos/([^/]+/[^/]+)")
+_SHA_RE = re.compile(r"^[0-9a-fA-F]{40}$")
 
 # ---------- time helpers ----------
+try:
+    from ciso8601 import parse_datetime as _parse_iso  # optional C parser
+except ImportError:
+    def _parse_iso(dt_str):
+        return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+
+@lru_cache(maxsize=8192)  # same finishTime/commit date strings recur across records and builds
 def utc(dt_str):
     if not dt_str:
         return None
-    return datetime.fromisoformat(dt_str.replace("Z", "+00:00")).astimezone(timezone.utc)
+    return _parse_iso(dt_str).astimezone(timezone.utc)
 
 def fmtiso(dt):
     return dt.astimezone(timezone.utc).isoformat()
 
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
 def day_key(dt_utc):
     return dt_utc.date().isoformat()  # YYYY-MM-DD
 
@@ -27,22 +63,72 @@ def human_dur(seconds: int) -> str:
     d, rem = divmod(s, 86400)
     h, rem = divmod(rem, 3600)
     m, s = divmod(rem, 60)
-    parts = []
-    if d: parts.append(f"{d}d")
-    if h or d: parts.append(f"{h}h")
-    if m or h or d: parts.append(f"{m}m")
-    parts.append(f"{s}s")
-    out = " ".join(parts)
+    # Leading zero units are dropped; once a unit is shown every smaller one is too
+    if d:
+        out = f"{d}d {h}h {m}m {s}s"
+    elif h:
+        out = f"{h}h {m}m {s}s"
+    elif m:
+        out = f"{m}m {s}s"
+    else:
+        out = f"{s}s"
     return f"-{out}" if neg else out
 
+# ---------- on-disk cache ----------
+class DiskCache:
+    """JSON files at <root>/<kind>/<key>.json for payloads that never change once final."""
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, f"{key}.json")
+
+    def get(self, kind, key):
+        try:
+            with open(self._path(kind, key), "rb") as f:
+                return _json_loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, kind, key, value):
+        path = self._path(kind, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)  # atomic, so concurrent workers never see half a file
+        except OSError:
+            pass
+
+    def prune(self, max_age_seconds):
+        """Delete entries written more than max_age_seconds ago (and stray temp files)."""
+        cutoff = datetime.now().timestamp() - max_age_seconds
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                path = os.path.join(dirpath, fn)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
 # ---------- ADO client ----------
 class ADO:
-    def __init__(self, org, project, pat=None):
+    def __init__(self, org, project, pat=None, cache=None):
         self.org = org
         self.project = project
+        self.cache = cache
+        self._defs_cache = None  # unfiltered list_definitions() result
         self.base = f"https://dev.azure.com/{org}/{project}"
         self.session = requests.Session()
-        self.session.headers.update({"Content-Type": "application/json"})
+        # Timelines are fetched concurrently; size the pool so workers don't queue on it
+        self.session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=HTTP_RETRY))
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",  # timelines are large JSON; ask for them compressed
+        })
         bearer = os.getenv("SYSTEM_ACCESSTOKEN") or os.getenv("AZDO_BEARER")
         if bearer:
             self.session.headers["Authorization"] = f"Bearer {bearer}"
@@ -53,23 +139,31 @@ class ADO:
 
     def _get(self, path, params=None, base=None):
         url = f"{self.base}{path}" if base is None else f"{base}{path}"
-        r = self.session.get(url, params=params, timeout=60)
+        r = self.session.get(url, params=params, timeout=HTTP_TIMEOUT)
         r.raise_for_status()
-        return r.json()
+        return _json_loads(r.content)
 
     def list_definitions(self, name=None):
+        if not name and self._defs_cache is not None:
+            return self._defs_cache
         params = {"api-version": API_VERSION}
         if name:
             params["name"] = name
-        return self._get("/_apis/build/definitions", params).get("value", [])
+        defs = self._get("/_apis/build/definitions", params).get("value", [])
+        if not name:
+            self._defs_cache = defs
+        return defs
 
     def get_definition(self, def_id: int):
         return self._get(f"/_apis/build/definitions/{def_id}", {"api-version": API_VERSION})
 
-    def list_builds(self, def_ids, min_time, max_time, branch=None, top=200):
+    def list_builds(self, def_ids, min_time, max_time, branch=None, top=1000):
+        # Only finished builds have a final timeline; skip queued/running ones server-side.
+        # Canceled builds stay in: one canceled after its swap succeeded still deployed.
         params = {
             "api-version": API_VERSION,
             "$top": top,
+            "statusFilter": "completed",
             "minTime": min_time.isoformat(),
             "maxTime": max_time.isoformat(),
             "queryOrder": "finishTimeDescending",
@@ -89,8 +183,19 @@ class ADO:
                 break
         return builds
 
-    def get_timeline(self, build_id):
-        return self._get(f"/_apis/build/builds/{build_id}/timeline", {"api-version": API_VERSION})
+    def get_timeline(self, build_id, version=None):
+        # version identifies this state of the build (e.g. its lastChangedDate); "Rerun failed jobs"
+        # rewrites a finished build's timeline and bumps it, so a cached copy is only trusted on a match
+        if self.cache and version:
+            hit = self.cache.get("timelines", build_id)
+            if hit and hit.get("version") == version:
+                return hit.get("timeline")
+        timeline = self._get(f"/_apis/build/builds/{build_id}/timeline", {"api-version": API_VERSION})
+        # Only a timeline whose records have all completed is final
+        recs = timeline.get("records") or []
+        if self.cache and version and recs and all(r.get("state") == "completed" for r in recs):
+            self.cache.put("timelines", build_id, {"version": version, "timeline": timeline})
+        return timeline
 
     def get_ado_commit(self, repo_id, sha):
         return self._get(f"/_apis/git/repositories/{repo_id}/commits/{sha}", {"api-version": API_VERSION})
@@ -109,6 +214,10 @@ def resolve_definition_ids(ado_client, names_csv):
     return sorted(set(out))
 
 # ---------- GitHub repo helpers ----------
+# One pooled session for all GitHub lookups so TLS connections are reused across commits
+_GH_SESSION = requests.Session()
+_GH_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=HTTP_RETRY))
+
 def extract_owner_repo(repo: dict) -> str | None:
     if not repo:
         return None
@@ -119,7 +228,7 @@ def extract_owner_repo(repo: dict) -> str | None:
             return v
     api_url = props.get("apiUrl") or repo.get("url")
     if api_url:
-        m = re.search(r"/repos/([^/]+/[^/]+)", api_url)
+        m = _API_REPOS_RE.search(api_url)
         if m:
             return m.group(1)
     clone = props.get("cloneUrl")
@@ -139,14 +248,16 @@ def github_commit_api(owner_repo: str, sha: str, props: dict) -> str:
     api_url = (props or {}).get("apiUrl")
     if api_url:
         base = api_url.rstrip("/")
-        if re.search(r"/repos/[^/]+/[^/]+$", base):
+        if _API_REPOS_TAIL_RE.search(base):
             return f"{base}/commits/{sha}"
-        m = re.search(r"^(https?://[^/]+)/repos/([^/]+/[^/]+)", base)
+        m = _API_HOST_REPOS_RE.search(base)
         if m:
             return f"{m.group(1)}/repos/{m.group(2)}/commits/{sha}"
     return f"https://api.github.com/repos/{owner_repo}/commits/{sha}"
 
-def get_commit_time(build, ado_client, gh_token=None, gh_repo_override=None, verbose=False):
+def commit_source(build, gh_repo_override=None, verbose=False):
+    """(kind, key, sha, owner_repo) identifying where the build's commit time comes from, else None.
+    key is the Azure repo id or the GitHub commit API URL; owner_repo is None for Azure Repos."""
     sha = build.get("sourceVersion")
     if not sha:
         if verbose: print(f"[LEAD] build {build.get('id')} has no sourceVersion")
@@ -160,13 +271,7 @@ def get_commit_time(build, ado_client, gh_token=None, gh_repo_override=None, ver
         if not rid:
             if verbose: print(f"[LEAD] build {build.get('id')} missing Azure Repos id")
             return None
-        try:
-            c = ado_client.get_ado_commit(rid, sha)
-            dt = (c.get("author", {}) or {}).get("date") or (c.get("committer", {}) or {}).get("date")
-            return utc(dt) if dt else None
-        except requests.HTTPError as e:
-            if verbose: print(f"[LEAD] ADO commit lookup failed for {sha}: {e}")
-            return None
+        return "ado", rid, sha, None
 
     # GitHub / GHES
     if "github" in rtype or gh_repo_override:
@@ -176,27 +281,108 @@ def get_commit_time(build, ado_client, gh_token=None, gh_repo_override=None, ver
                 props = list((repo.get("properties") or {}).keys())
                 print(f"[LEAD] cannot determine GitHub repo for build {build.get('id')} (props={props})")
             return None
-        api_url = github_commit_api(owner_repo, sha, repo.get("properties") or {})
-        headers = {"Accept": "application/vnd.github+json"}
-        if gh_token:
-            headers["Authorization"] = f"Bearer {gh_token}"
-        try:
-            r = requests.get(api_url, headers=headers, timeout=60)
-            if r.status_code == 200:
-                j = r.json().get("commit", {})
-                dt = (j.get("author", {}) or {}).get("date") or (j.get("committer", {}) or {}).get("date")
-                return utc(dt) if dt else None
-            if verbose:
-                print(f"[LEAD] GitHub API {r.status_code} for {api_url}")
-            return None
-        except requests.RequestException as e:
-            if verbose: print(f"[LEAD] GitHub lookup failed: {e}")
-            return None
+        return "github", github_commit_api(owner_repo, sha, repo.get("properties") or {}), sha, owner_repo
 
     if verbose:
         print(f"[LEAD] unknown repo type '{rtype}' for build {build.get('id')}")
     return None
 
+def commit_cache_key(src):
+    """On-disk cache key for a commit_source() result: the sha plus a digest of where it was looked up."""
+    kind, key, sha, _ = src
+    return f"{sha}-{hashlib.sha1(f'{kind}|{key}'.encode()).hexdigest()[:12]}"
+
+def github_batch_key(src):
+    """(owner_repo, sha) when a commit_source() result can be looked up via github.com GraphQL, else None."""
+    if not src or src[0] != "github":
+        return None
+    _, api_url, sha, owner_repo = src
+    if not _SHA_RE.match(sha) or owner_repo.count("/") != 1:
+        return None
+    # GHES exposes GraphQL elsewhere; leave those to the REST path
+    if not api_url.startswith("https://api.github.com/"):
+        return None
+    return owner_repo, sha
+
+# ---------- GitHub client ----------
+class GH:
+    def __init__(self, token, graphql_url=GH_GRAPHQL_URL):
+        self.graphql_url = graphql_url
+        self.session = _GH_SESSION
+        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+
+    def batch_commit_times(self, owner_repo, shas, batch=GH_GRAPHQL_BATCH):
+        """sha -> commit time (author date, else committer date) for one repo, batch commits per query.
+        SHAs GitHub can't resolve are left out so callers can fall back to REST."""
+        owner, name = owner_repo.split("/", 1)
+        shas = list(shas)
+        out = {}
+        for i in range(0, len(shas), batch):
+            chunk = shas[i:i + batch]
+            fields = " ".join(
+                f'c{n}: object(oid: "{sha}") {{ ... on Commit {{ authoredDate committedDate }} }}'
+                for n, sha in enumerate(chunk)
+            )
+            query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+            r = self.session.post(self.graphql_url, headers=self.headers, timeout=(HTTP_TIMEOUT[0], 60),
+                                  json={"query": query, "variables": {"owner": owner, "name": name}})
+            r.raise_for_status()
+            repo = (_json_loads(r.content).get("data") or {}).get("repository") or {}
+            for n, sha in enumerate(chunk):
+                c = repo.get(f"c{n}") or {}
+                dt = c.get("authoredDate") or c.get("committedDate")
+                if dt:
+                    out[sha] = utc(dt)
+        return out
+
+# (kind, key, sha) -> commit time; only successful lookups are kept so a failure is retried by the next build
+_COMMIT_TIMES = {}
+
+def _fetch_commit_time_cached(ado_client, kind, key, sha, gh_token=None, verbose=False):
+    ck = (kind, key, sha)
+    ct = _COMMIT_TIMES.get(ck)
+    if ct is None:
+        ct = _fetch_commit_time(ado_client, kind, key, sha, gh_token, verbose)
+        if ct is not None:
+            _COMMIT_TIMES[ck] = ct
+    return ct
+
+def _fetch_commit_time(ado_client, kind, key, sha, gh_token=None, verbose=False):
+    """Network part of get_commit_time; key is the Azure repo id or the GitHub commit API URL."""
+    if kind == "ado":
+        try:
+            c = ado_client.get_ado_commit(key, sha)
+            dt = (c.get("author", {}) or {}).get("date") or (c.get("committer", {}) or {}).get("date")
+            return utc(dt) if dt else None
+        except requests.HTTPError as e:
+            if verbose: print(f"[LEAD] ADO commit lookup failed for {sha}: {e}")
+            return None
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if gh_token:
+        headers["Authorization"] = f"Bearer {gh_token}"
+    try:
+        r = _GH_SESSION.get(key, headers=headers, timeout=HTTP_TIMEOUT)
+        if r.status_code == 200:
+            j = _json_loads(r.content).get("commit", {})
+            dt = (j.get("author", {}) or {}).get("date") or (j.get("committer", {}) or {}).get("date")
+            return utc(dt) if dt else None
+        if verbose:
+            print(f"[LEAD] GitHub API {r.status_code} for {key}")
+        return None
+    except (requests.RequestException, ValueError) as e:  # ValueError: non-JSON body (proxy/captive portal)
+        if verbose: print(f"[LEAD] GitHub lookup failed: {e}")
+        return None
+
+def get_commit_time(build, ado_client, gh_token=None, gh_repo_override=None, verbose=False, prefetched=None):
+    src = commit_source(build, gh_repo_override, verbose)
+    if not src:
+        return None
+    kind, key, sha, owner_repo = src
+    if prefetched and owner_repo and (owner_repo, sha) in prefetched:
+        return prefetched[(owner_repo, sha)]
+    return _fetch_commit_time_cached(ado_client if kind == "ado" else None, kind, key, sha, gh_token, verbose)
+
 # ---------- main ----------
 def main():
     ap = argparse.ArgumentParser(description="DORA via Build Timelines (slot swap as prod deploy).")
@@ -211,6 +397,9 @@ def main():
     ap.add_argument("--github-repo", help='Override owner/repo for commit lookup, e.g. "org/app-repo"')
     ap.add_argument("--app", help="Logical application name for CSVs (optional)")
     ap.add_argument("--out-prefix", default="", help="Prefix for output filenames, e.g. 'email-queue-'")
+    ap.add_argument("--workers", type=int, default=16, help="Concurrent HTTP requests for timeline/commit lookups")
+    ap.add_argument("--cache-dir", default=".dora_cache", help="Directory for cached timelines/commit times")
+    ap.add_argument("--no-cache", action="store_true", help="Don't read or write the on-disk cache")
     ap.add_argument("--verbose", action="store_true", help="Verbose logging")
     args = ap.parse_args()
 
@@ -220,10 +409,18 @@ def main():
     if not args.github_repo:
         args.github_repo = os.getenv("GITHUB_REPO")
 
+    # Same SHA is often deployed by several builds; only share lookups within this run
+    _COMMIT_TIMES.clear()
+
     APP = args.app or ""
     OUT = args.out_prefix or ""
 
-    ado = ADO(args.org, args.project, args.pat or os.getenv("AZDO_PAT"))
+    cache = None if args.no_cache else DiskCache(os.path.join(args.cache_dir, args.org, args.project))
+    if cache:
+        # An entry is written no earlier than its build finished, so anything older than the
+        # window belongs to builds that have left it; this keeps the cache bounded to --days
+        cache.prune(timedelta(days=args.days).total_seconds())
+    ado = ADO(args.org, args.project, args.pat or os.getenv("AZDO_PAT"), cache=cache)
 
     if args.pipeline_ids and args.pipeline_ids.strip():
         defs = [int(x) for x in args.pipeline_ids.split(",") if x.strip()]
@@ -235,43 +432,56 @@ def main():
         raise SystemExit("Provide --pipeline-ids or --pipeline-names")
 
     # Pretty names for CLI traces
-    def_names = {}
-    for did in defs:
-        try:
-            dd = ado.get_definition(did)
-            def_names[did] = dd.get("name")
-        except Exception:
-            pass
+    try:
+        all_defs = {d["id"]: d.get("name") for d in ado.list_definitions()}
+    except Exception:
+        all_defs = {}
+    def_names = {did: all_defs.get(did) for did in defs}
 
     until = datetime.now(timezone.utc) + timedelta(minutes=5)
     since = until - timedelta(days=args.days)
 
     builds = ado.list_builds(defs, since, until, branch=args.branch)
+    # A build canceled before it started never ran a swap job, so its timeline isn't worth a request.
+    # Canceled builds that did start are kept: one canceled after a successful swap did deploy.
+    builds = [b for b in builds
+              if not ((b.get("result") or "").lower() == "canceled" and not b.get("startTime"))]
     deployments, failures = [], []
+    dep_builds = []  # (build, deploy time) for the lead-time lookups
+
+    # Fetch timelines concurrently (network-bound); results come back in build order
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        timelines = list(ex.map(
+            ado.get_timeline,
+            [b.get("id") for b in builds],
+            [b.get("lastChangedDate") or b.get("finishTime") for b in builds],
+        ))
 
-    for b in builds:
+    for b, timeline in zip(builds, timelines):
         bid = b.get("id")
-        timeline = ado.get_timeline(bid)
         recs = timeline.get("records", [])
 
-        def has_job(sub):
-            sub = sub.lower()
-            return next((r for r in recs if r.get("type") == "Job" and sub in (r.get("name","").lower())), None)
-
-        def has_stage(name_sub):
-            name_sub = name_sub.lower()
-            return next((r for r in recs if r.get("type") == "Stage" and name_sub in (r.get("name","").lower())), None)
-
-        swap = has_job("swap")
-        validate_swap = has_job("validate")
-        rollback = has_job("rollback")
-        _ = has_stage("deploylive")  # optional
+        # One pass keeps only Jobs/Stages (not Tasks, Phases, Checkpoints) with names lowercased once;
+        # the lookups below are substring matches over these short lists
+        jobs, stages = [], []
+        for r in recs:
+            t = r.get("type")
+            if t == "Job":
+                jobs.append(((r.get("name") or "").lower(), r))
+            elif t == "Stage":
+                stages.append(((r.get("name") or "").lower(), r))
+
+        swap = next((r for n, r in jobs if "swap" in n), None)
+        validate_swap = next((r for n, r in jobs if "validate" in n), None)
+        rollback = next((r for n, r in jobs if "rollback" in n), None)
+        _ = next((r for n, r in stages if "deploylive" in n), None)  # optional
 
         # Successful production deployment = swap job succeeded
         if swap and (swap.get("result") or "").lower() == "succeeded":
             dep_time = utc(swap.get("finishTime"))
             if dep_time:
                 deployments.append({"buildId": bid, "when": dep_time})
+                dep_builds.append((b, dep_time))
 
                 # Console trace (useful in logs)
                 repo = b.get("repository") or {}
@@ -291,13 +501,13 @@ def main():
                 failures.append({"buildId": bid, "when": fail_t})
 
     # ----- Deployment Frequency (daily) -----
-    daily = {}  # date -> [deploy times...]
+    daily = {}  # date -> (count, first, last, weekday)
     for d in deployments:
-        k = day_key(d["when"])
-        daily.setdefault(k, []).append(d["when"])
-    # Normalize each day’s list (sort for first/last)
-    for k in daily:
-        daily[k] = sorted(daily[k])
+        when = d["when"]
+        k = day_key(when)
+        cur = daily.get(k)
+        daily[k] = ((cur[0] + 1, min(cur[1], when), max(cur[2], when), cur[3]) if cur
+                    else (1, when, when, _WEEKDAYS[when.weekday()]))
 
     # ----- Change Failure Rate -----
     cfr_pct = (len(failures) / len(deployments) * 100.0) if deployments else 0.0
@@ -305,26 +515,63 @@ def main():
     # ----- Lead Time for Changes (per deployment) -----
     run_base_url = f"https://dev.azure.com/{ado.org}/{ado.project}/_build/results?buildId="
     lead_rows = []
-    dep_by_build = {d["buildId"]: d for d in deployments}
-    for b in builds:
+
+    # Builds sharing a commit (retries, re-runs) are looked up once: resolve each build's source,
+    # then fetch each distinct (kind, key, sha) a single time and spread the results back
+    dep_srcs = [commit_source(b, args.github_repo, args.verbose) for b, _ in dep_builds]
+    unique_srcs = list(dict.fromkeys(src for src in dep_srcs if src))
+
+    # Commit timestamps are immutable per (repo, sha), so they're cached across runs; read each once
+    known = {}
+    if cache:
+        for src in unique_srcs:
+            hit = cache.get("commits", commit_cache_key(src))
+            if hit and hit.get("commitTimeUtc"):
+                known[src] = utc(hit["commitTimeUtc"])
+
+    # GitHub commits: one GraphQL query per repo per batch instead of one REST call per deployment
+    prefetched = {}
+    if args.github_token:
+        gh = GH(args.github_token)
+        by_repo = {}
+        for src in unique_srcs:
+            key = github_batch_key(src)
+            if key and src not in known:
+                by_repo.setdefault(key[0], set()).add(key[1])
+        for owner_repo, shas in by_repo.items():
+            try:
+                for sha, ct in gh.batch_commit_times(owner_repo, sorted(shas)).items():
+                    prefetched[(owner_repo, sha)] = ct
+            except (requests.RequestException, ValueError) as e:  # ValueError: non-JSON body
+                if args.verbose: print(f"[LEAD] GitHub GraphQL batch failed for {owner_repo}, using REST: {e}")
+
+    def commit_time(src):
+        if src in known:
+            return known[src]
+        kind, key, sha, owner_repo = src
+        ct = prefetched.get((owner_repo, sha)) if owner_repo else None
+        if ct is None:
+            ct = _fetch_commit_time_cached(ado if kind == "ado" else None, kind, key, sha,
+                                           args.github_token, args.verbose)
+        if cache and ct:
+            cache.put("commits", commit_cache_key(src), {"commitTimeUtc": fmtiso(ct)})
+        return ct
+
+    # Distinct commit lookups are independent; overlap them like the timelines
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        times_by_src = dict(zip(unique_srcs, ex.map(commit_time, unique_srcs)))
+    commit_times = [times_by_src.get(src) if src else None for src in dep_srcs]
+
+    for (b, dep_time), ct in zip(dep_builds, commit_times):
         bid = b.get("id")
-        dep = dep_by_build.get(bid)
-        if not dep:
-            continue
-        ct = get_commit_time(
-            b, ado_client=ado,
-            gh_token=args.github_token,
-            gh_repo_override=args.github_repo,
-            verbose=args.verbose
-        )
-        if ct and dep["when"]:
-            secs = int((dep["when"] - ct).total_seconds())
+        if ct:
+            secs = int((dep_time - ct).total_seconds())
             lead_rows.append({
                 "app": APP,
                 "buildId": bid,
                 "commit": b.get("sourceVersion"),
                 "commitTimeUtc": fmtiso(ct),
-                "deployTimeUtc": fmtiso(dep["when"]),
+                "deployTimeUtc": fmtiso(dep_time),
                 "leadTimeSeconds": secs,
                 "leadTimeHours": round(secs/3600, 3),
                 "leadTimeHuman": human_dur(secs),
@@ -333,9 +580,12 @@ def main():
 
     # ----- MTTR (Failed Deployment Recovery Time) -----
     successes_sorted = sorted(deployments, key=lambda x: x["when"])
+    success_times = [s["when"] for s in successes_sorted]
     mttr_rows = []
     for f in sorted(failures, key=lambda x: x["when"]):
-        next_success = next((s for s in successes_sorted if s["when"] > f["when"]), None)
+        # first deployment strictly after the failure
+        idx = bisect.bisect_right(success_times, f["when"])
+        next_success = successes_sorted[idx] if idx < len(successes_sorted) else None
         if next_success:
             secs = int((next_success["when"] - f["when"]).total_seconds())
             mttr_rows.append({
@@ -356,38 +606,32 @@ def main():
     window_end   = until.astimezone(timezone.utc).isoformat()
 
     # 1) Deployment Frequency (daily)
-    with open(f"{OUT}deployment_frequency.csv", "w", newline="") as f:
+    with open(f"{OUT}deployment_frequency.csv", "w", newline="", buffering=CSV_BUFFER) as f:
         w = csv.DictWriter(f, fieldnames=[
             "app","date","deployments","firstDeployAtUtc","lastDeployAtUtc","weekday"
         ])
         w.writeheader()
-        for day in sorted(daily.keys()):  # chronological
-            times = daily[day]
-            first = times[0]
-            last = times[-1]
-            weekday = datetime.fromisoformat(day).strftime("%a")
-            w.writerow({
-                "app": APP,
-                "date": day,
-                "deployments": len(times),
-                "firstDeployAtUtc": fmtiso(first),
-                "lastDeployAtUtc": fmtiso(last),
-                "weekday": weekday
-            })
+        w.writerows({
+            "app": APP,
+            "date": day,
+            "deployments": count,
+            "firstDeployAtUtc": fmtiso(first),
+            "lastDeployAtUtc": fmtiso(last),
+            "weekday": weekday
+        } for day, (count, first, last, weekday) in sorted(daily.items()))  # chronological
 
     # 2) Lead Time for Changes (per deployment)
     lead_rows_sorted = sorted(lead_rows, key=lambda r: r["deployTimeUtc"])
-    with open(f"{OUT}lead_time_for_changes.csv", "w", newline="") as f:
+    with open(f"{OUT}lead_time_for_changes.csv", "w", newline="", buffering=CSV_BUFFER) as f:
         w = csv.DictWriter(f, fieldnames=[
             "app","buildId","runUrl","commit","commitTimeUtc","deployTimeUtc",
             "leadTimeSeconds","leadTimeHours","leadTimeHuman"
         ])
         w.writeheader()
-        for r in lead_rows_sorted:
-            w.writerow(r)
+        w.writerows(lead_rows_sorted)
 
     # 3) Change Failure Rate (window summary)
-    with open(f"{OUT}change_failure_rate.csv", "w", newline="") as f:
+    with open(f"{OUT}change_failure_rate.csv", "w", newline="", buffering=CSV_BUFFER) as f:
         w = csv.DictWriter(f, fieldnames=[
             "app","windowStartUtc","windowEndUtc","totalDeployments","failedChanges","changeFailureRatePct"
         ])
@@ -403,15 +647,14 @@ def main():
 
     # 4) Failed Deployment Recovery Time (MTTR rows)
     mttr_rows_sorted = sorted(mttr_rows, key=lambda r: r["failedAtUtc"])
-    with open(f"{OUT}failed_deployment_recovery_time.csv", "w", newline="") as f:
+    with open(f"{OUT}failed_deployment_recovery_time.csv", "w", newline="", buffering=CSV_BUFFER) as f:
         w = csv.DictWriter(f, fieldnames=[
             "app","failedBuildId","failedAtUtc","failedRunUrl",
             "restoredBuildId","restoredAtUtc","restoredRunUrl",
             "mttrSeconds","mttrHours","mttrHuman"
         ])
         w.writeheader()
-        for r in mttr_rows_sorted:
-            w.writerow(r)
+        w.writerows(mttr_rows_sorted)
 
     # Console summary
     def fmt_avg(sec_list):